@@ -6,28 +6,33 @@ import argparse, logging, sys
 from pathlib import Path
 
 
-from structurizr_excel.loader  import load_excel, validate
-from structurizr_excel.builder import build_workspace
-
 def main() -> None:
     p = argparse.ArgumentParser()
     p.add_argument("excel", help="flows_applications.xlsx")
     p.add_argument("--output", default="build", help="Output folder")
     p.add_argument("--log-level", default="INFO", choices=["DEBUG","INFO","WARNING","ERROR"])
+    p.add_argument("--no-cache", action="store_true", help="Always re-parse the Excel file")
+    p.add_argument("--engine", default="auto", choices=["auto", "calamine", "openpyxl", "polars"],
+                   help="Excel reader (polars is optional)")
     args = p.parse_args()
 
+    # Imports lourds (pandas, pystructurizr) après argparse : --help reste instantané
+    from structurizr_excel.loader  import load_excel, validate
+    from structurizr_excel.builder import build_workspace, StreamDumper
+
     logging.basicConfig(level=args.log_level)
     output = Path(args.output)
     output.mkdir(parents=True, exist_ok=True)
 
-    apps, flows, procs = load_excel(Path(args.excel))
+    apps, flows, procs = load_excel(Path(args.excel), use_cache=not args.no_cache, engine=args.engine)
     logging.debug("File loaded")
     validate(apps, flows)
     logging.debug("File validated")
     ws = build_workspace(apps, flows, procs)
 
     dsl_path = output / "workspace.dsl"
-    dsl_path.write_text(ws.dump(), encoding="utf-8")
+    with dsl_path.open("w", encoding="utf-8") as fh:
+        ws.dump(StreamDumper(fh))
     logging.info("DSL saved → %s", dsl_path)
 
 
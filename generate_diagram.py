@@ -6,22 +6,28 @@ Usage:
     python generate_diagram.py flows_applications.xlsx --views system,container --output diagrams
 """
 
+from __future__ import annotations
+
 import argparse
 import logging
 import os
 from pathlib import Path
 import sys
-import pandas as pd
+from typing import TYPE_CHECKING
 
-from structurizr.model import Workspace
-from structurizr.view import AutoLayout
+# pandas / structurizr are imported lazily so --help stays instant
+if TYPE_CHECKING:
+    import pandas as pd
+    from structurizr.model import Workspace
 
-REQUIRED_FLOW_COLUMNS = {
+REQUIRED_FLOW_COLUMNS = frozenset({
     "ID", "Name", "Outbound", "Inbound", "Objet", "Protocol", "Format", "Status"
-}
-REQUIRED_APP_COLUMNS = {
+})
+REQUIRED_APP_COLUMNS = frozenset({
     "ID", "Name", "Application", "Component", "ParentAppID"
-}
+})
+# only these columns are parsed; extra export columns are skipped
+USED_COLUMNS = REQUIRED_FLOW_COLUMNS | REQUIRED_APP_COLUMNS | {"Description", "Frequency"}
 
 # --------------- CLI ---------------
 
@@ -41,34 +47,48 @@ def parse_args():
 # --------------- Data ---------------
 
 def load_data(xlsx_path: Path):
-    flows_df = pd.read_excel(xlsx_path, sheet_name="Flows").fillna("")
-    apps_df = pd.read_excel(xlsx_path, sheet_name="Applications").fillna("")
+    import pandas as pd
+    opts = dict(sheet_name=["Flows", "Applications"], dtype=str, na_filter=False, keep_default_na=False,
+                usecols=USED_COLUMNS.__contains__)
+    try:
+        sheets = pd.read_excel(xlsx_path, engine="calamine", **opts)
+    except ImportError:
+        # python-calamine absent: pandas opens openpyxl read-only already
+        sheets = pd.read_excel(xlsx_path, engine="openpyxl", **opts)
+    flows_df = sheets["Flows"]
+    apps_df = sheets["Applications"]
+    if "Description" not in apps_df.columns:
+        apps_df["Description"] = ""
+    if "Frequency" not in flows_df.columns:
+        flows_df["Frequency"] = ""
     return apps_df, flows_df
 
 def validate_data(apps_df: pd.DataFrame, flows_df: pd.DataFrame):
-    missing_flow = REQUIRED_FLOW_COLUMNS - set(flows_df.columns)
-    missing_app = REQUIRED_APP_COLUMNS - set(apps_df.columns)
+    missing_flow = REQUIRED_FLOW_COLUMNS.difference(flows_df.columns)
+    missing_app = REQUIRED_APP_COLUMNS.difference(apps_df.columns)
     if missing_flow:
         raise ValueError(f"Missing columns in Flows: {', '.join(missing_flow)}")
     if missing_app:
         raise ValueError(f"Missing columns in Applications: {', '.join(missing_app)}")
 
-    id_set = set(apps_df["ID"])
-    name_set = set(apps_df["Name"])
+    ids = apps_df["ID"].to_numpy()
+    names = apps_df["Name"].to_numpy()
 
-    invalid_parents = apps_df[(apps_df["Component"] == "#") & (~apps_df["ParentAppID"].isin(id_set))]
-    if not invalid_parents.empty:
-        raise ValueError("ParentAppID invalid in rows: " + ", ".join(map(str, invalid_parents.index.tolist())))
+    is_comp = apps_df["Component"].to_numpy() == "#"
+    invalid = is_comp & ~apps_df["ParentAppID"].isin(ids).to_numpy()
+    if invalid.any():
+        raise ValueError("ParentAppID invalid in rows: " + ", ".join(map(str, apps_df.index[invalid])))
 
     for col in ("Outbound", "Inbound"):
-        invalid = flows_df[~flows_df[col].isin(name_set)]
-        if not invalid.empty:
-            raise ValueError(f"{col} contains unknown names in rows: " + ", ".join(map(str, invalid.index.tolist())))
+        known = flows_df[col].isin(names).to_numpy()
+        if not known.all():
+            raise ValueError(f"{col} contains unknown names in rows: "
+                             + ", ".join(map(str, flows_df.index[~known])))
 
     for col in ("Protocol", "Objet", "Format"):
-        empty = flows_df[flows_df[col] == ""]
-        if not empty.empty:
-            raise ValueError(f"{col} empty in rows: " + ", ".join(map(str, empty.index.tolist())))
+        empty = flows_df[col].to_numpy() == ""
+        if empty.any():
+            raise ValueError(f"{col} empty in rows: " + ", ".join(map(str, flows_df.index[empty])))
 
 # --------------- Model ---------------
 
@@ -76,41 +96,48 @@ def build_model(apps_df: pd.DataFrame, flows_df: pd.DataFrame):
     from structurizr.model import Workspace
     workspace = Workspace(name="Applications & Flows", description="Generated from Excel")
     model = workspace.get_model()
-    element_by_name = {}
 
     # Add software systems
-    for _, row in apps_df[apps_df["Application"] == "#"].iterrows():
-        ss = model.add_software_system(row["Name"], row.get("Description", ""))
+    is_app = apps_df["Application"].to_numpy() == "#"
+    is_comp = apps_df["Component"].to_numpy() == "#"
+    sys_rows = apps_df.loc[is_app, ["Name", "Description"]]
+    systems = [model.add_software_system(name, descr)
+               for name, descr in sys_rows.itertuples(index=False, name=None)]
+    for ss in systems:
         ss.add_tags("ApplicationSystem")
-        element_by_name[row["Name"]] = ss
+    element_by_name = dict(zip(sys_rows["Name"].tolist(), systems))
 
     # Add containers
-    apps_dict = apps_df.set_index("ID").to_dict("index")
-    for _, row in apps_df[apps_df["Component"] == "#"].iterrows():
-        parent_row = apps_dict.get(row["ParentAppID"])
-        if not parent_row:
+    name_by_id = dict(zip(apps_df["ID"].to_numpy(), apps_df["Name"].to_numpy()))
+    cont_rows = apps_df.loc[is_comp, ["ParentAppID", "Name", "Description"]]
+    for parent_id, name, descr in cont_rows.itertuples(index=False, name=None):
+        parent_sys = element_by_name.get(name_by_id.get(parent_id))
+        if not parent_sys:
             continue
-        parent_sys = element_by_name[parent_row["Name"]]
-        c = parent_sys.add_container(row["Name"], row.get("Description", ""), "")
+        c = parent_sys.add_container(name, descr, "")
         c.add_tags("ApplicationContainer")
-        element_by_name[row["Name"]] = c
+        element_by_name[name] = c
 
     # Add relationships
-    for _, row in flows_df.iterrows():
-        src = element_by_name[row["Outbound"]]
-        dst = element_by_name[row["Inbound"]]
-        rel = src.uses(dst, description=row["Objet"], technology=row["Protocol"])
-        rel.properties["dataFormat"] = row["Format"]
-        if row["Status"]:
-            rel.add_tags(row["Status"])
-        if row["Frequency"]:
-            rel.properties["Frequency"] = row["Frequency"]
+    flow_rows = flows_df[["Outbound", "Inbound", "Objet", "Protocol", "Format", "Status", "Frequency"]]
+    for out_name, in_name, objet, proto, fmt, status, freq in flow_rows.itertuples(index=False, name=None):
+        src = element_by_name[out_name]
+        dst = element_by_name[in_name]
+        rel = src.uses(dst, description=objet, technology=proto)
+        rel.properties["dataFormat"] = fmt
+        if status:
+            rel.add_tags(status)
+        if freq:
+            rel.properties["Frequency"] = freq
     return workspace
 
 # --------------- Views ---------------
 
 def filter_relationships(workspace: Workspace, proto_filter, freq_filter, hide_tags):
+    if not (proto_filter or freq_filter or hide_tags):
+        return
     model = workspace.get_model()
+    # copy: remove_relationship mutates the underlying collection
     for rel in list(model.get_relationships()):
         if proto_filter and rel.technology.lower() not in proto_filter:
             model.remove_relationship(rel)
@@ -118,12 +145,12 @@ def filter_relationships(workspace: Workspace, proto_filter, freq_filter, hide_t
         if freq_filter and rel.properties.get("Frequency", "").lower() not in freq_filter:
             model.remove_relationship(rel)
             continue
-        if hide_tags and (set(rel.tags) & hide_tags):
+        if hide_tags and any(t in hide_tags for t in rel.tags):
             model.remove_relationship(rel)
             continue
 
 def create_views(workspace: Workspace, views_sel):
-    from structurizr.view import AutoLayout, SystemContextView, ContainerView
+    from structurizr.view import AutoLayout
     views = workspace.get_views()
     styles = views.get_configuration().get_styles()
     styles.add_element_style(tag="ApplicationSystem").shape("RoundedBox")
@@ -132,21 +159,23 @@ def create_views(workspace: Workspace, views_sel):
     styles.add_relationship_style(tag="Change").color("#ff8c00")
     styles.add_relationship_style(tag="Keep").color("#6c757d")
 
+    model = workspace.get_model()
+    layout = AutoLayout()
     if "system" in views_sel:
-        scv = views.create_system_context_view(workspace.get_model(), "SystemContext",
+        scv = views.create_system_context_view(model, "SystemContext",
                                                "All application systems")
         scv.add_all_software_systems()
         scv.add_all_relationships()
-        AutoLayout().apply(scv)
+        layout.apply(scv)
     if "container" in views_sel:
-        for ss in workspace.get_model().get_software_systems():
+        for ss in model.get_software_systems():
             if not ss.get_containers():
                 continue
             cv = views.create_container_view(ss, f"{ss.name}_containers", f"Containers for {ss.name}")
             cv.add(ss)
             cv.add_all_containers()
             cv.add_nearest_neighbours(ss)
-            AutoLayout().apply(cv)
+            layout.apply(cv)
 
 # --------------- Export ---------------
 
@@ -175,9 +204,9 @@ def main():
     validate_data(apps_df, flows_df)
     workspace = build_model(apps_df, flows_df)
 
-    proto_filter = set(p.strip().lower() for p in args.filter_protocol.split(",") if p.strip())
-    freq_filter = set(f.strip().lower() for f in args.filter_frequency.split(",") if f.strip())
-    hide_tags = set(t.strip() for t in args.hide_tags.split(",") if t.strip())
+    proto_filter = frozenset(p.strip().lower() for p in args.filter_protocol.split(",") if p.strip())
+    freq_filter = frozenset(f.strip().lower() for f in args.filter_frequency.split(",") if f.strip())
+    hide_tags = frozenset(t.strip() for t in args.hide_tags.split(",") if t.strip())
 
     filter_relationships(workspace, proto_filter, freq_filter, hide_tags)
 
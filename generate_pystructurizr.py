@@ -8,17 +8,23 @@
 * Styles adaptés (tag `ApplicationGroup`).
 """
 
+from __future__ import annotations
+
 import argparse
 import logging
 import sys
 import re
+from functools import lru_cache
 from pathlib import Path
-from typing import Tuple, Set, Dict
+from typing import TYPE_CHECKING, Tuple, Set, FrozenSet, Dict
 
-import pandas as pd
 from pystructurizr.dsl import View, Dumper, Workspace  # type: ignore
 from types import SimpleNamespace
 
+# pandas / calamine sont importés à l'usage : --help reste instantané
+if TYPE_CHECKING:
+    import pandas as pd
+
 # -------------------------------------------------------------------
 # Patch View.dump – gère group_map lorsqu’elle est fournie
 # -------------------------------------------------------------------
@@ -63,127 +69,156 @@ setattr(Workspace, "CustomView", _custom_view)
 # -------------------------------------------------------------------
 # Constants
 # -------------------------------------------------------------------
-REQUIRED_APP = {"ID", "Name", "Application", "Component", "ParentAppID", "Status"}
-REQUIRED_FLOW = {
+REQUIRED_APP = frozenset({"ID", "Name", "Application", "Component", "ParentAppID", "Status"})
+REQUIRED_FLOW = frozenset({
     "ID", "Name", "Outbound", "Inbound", "Objet", "Protocol", "Format", "Tags", "BusinessProcess"
-}
+})
 
 # -------------------------------------------------------------------
 # Helpers
 # -------------------------------------------------------------------
 
-def split_multi(text: str) -> Set[str]:
-    return {t for t in re.split(r"[;,\s]+", (text or "").lower()) if t}
+_SEP_TABLE = str.maketrans(";,", "  ")
+_CAMEL_RE = re.compile(r"[^0-9a-zA-Z]")
+
+@lru_cache(maxsize=4096)
+def split_multi(text: str) -> FrozenSet[str]:
+    return frozenset((text or "").translate(_SEP_TABLE).lower().split())
 
+@lru_cache(maxsize=None)
 def camel(s: str) -> str:
-    return "".join(w.capitalize() for w in re.split(r"[^0-9a-zA-Z]", s) if w)
+    return "".join(w.capitalize() for w in _CAMEL_RE.split(s) if w)
 
 # -------------------------------------------------------------------
 # Load & validate Excel
 # -------------------------------------------------------------------
 
 def load_excel(path: Path) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
-    kw = dict(dtype=str, keep_default_na=False, engine="openpyxl")
-    apps = pd.read_excel(path, sheet_name="Applications", **kw)
-    flows = pd.read_excel(path, sheet_name="Flows", **kw)
-    try:
-        procs = pd.read_excel(path, sheet_name="BusinessProcesses", **kw)
-    except ValueError:
-        procs = pd.DataFrame(columns=["ID", "Name"])
-
-    # strip
-    for col in ("ID", "ParentAppID"):
-        apps[col] = apps[col].str.strip()
-    for col in ("Outbound", "Inbound", "Tags", "BusinessProcess"):
-        flows[col] = flows[col].str.strip()
-    apps["Status"] = apps["Status"].str.strip().str.lower()
+    import pandas as pd
+    from structurizr_excel.loader import read_sheets
+
+    sheets = read_sheets(path, ("Applications", "Flows"), ("BusinessProcesses",),
+                         lower={"Applications": ("Status",)},
+                         columns={"Applications": REQUIRED_APP | {"Description"},
+                                  "Flows": REQUIRED_FLOW,
+                                  "BusinessProcesses": {"ID", "Name"}})
+    apps, flows = sheets["Applications"], sheets["Flows"]
+    procs = sheets.get("BusinessProcesses", pd.DataFrame()).reindex(columns=["ID", "Name"], fill_value="")
+
+    # Status ne prend que quelques valeurs : stocké en catégorie (codes int8)
+    if "Status" in apps.columns:
+        apps["Status"] = apps["Status"].astype("category")
+    if "Description" not in apps.columns:
+        apps["Description"] = ""
     return apps, flows, procs
 
 
 def validate(apps: pd.DataFrame, flows: pd.DataFrame):
-    if diff := REQUIRED_APP - set(apps.columns):
+    if diff := REQUIRED_APP.difference(apps.columns):
         raise ValueError(f"Applications missing columns: {', '.join(diff)}")
-    if diff := REQUIRED_FLOW - set(flows.columns):
+    if diff := REQUIRED_FLOW.difference(flows.columns):
         raise ValueError(f"Flows missing columns: {', '.join(diff)}")
 
-    ids = set(apps["ID"])
-    bad_parent = apps[(apps["Component"] == "#") & (~apps["ParentAppID"].isin(ids))]
-    if not bad_parent.empty:
-        raise ValueError("Invalid ParentAppID rows: " + ", ".join(map(str, bad_parent.index)))
+    ids = apps["ID"].to_numpy()
+    is_comp = apps["Component"].to_numpy() == "#"
+    bad_mask = is_comp & ~apps["ParentAppID"].isin(ids).to_numpy()
+    if bad_mask.any():
+        raise ValueError("Invalid ParentAppID rows: " + ", ".join(map(str, apps.index[bad_mask])))
 
     for col in ("Outbound", "Inbound"):
-        bad = flows[~flows[col].isin(ids)]
-        if not bad.empty:
-            raise ValueError(f"{col} unknown IDs rows: {', '.join(map(str, bad.index))}")
+        known = flows[col].isin(ids).to_numpy()
+        if not known.all():
+            raise ValueError(f"{col} unknown IDs rows: {', '.join(map(str, flows.index[~known]))}")
 
 # -------------------------------------------------------------------
 # Workspace builder
 # -------------------------------------------------------------------
 
 def build_workspace(apps: pd.DataFrame, flows: pd.DataFrame, procs: pd.DataFrame) -> Workspace:
+    import numpy as np
+    import pandas as pd
+
     ws = Workspace()
     model = ws.Model(name="model")
 
     elem_by_id: Dict[str, any] = {}
-    groups_by_id: Dict[str, any] = {}
     container_parent: Dict[any, any] = {}
+    proc_index: Dict[str, Dict[any, None]] = {}
+    tag_sets: Dict[int, Set[str]] = {}
+
+    def add_tag(el, tag: str) -> None:
+        # el.tags est une liste : le set parallèle évite un scan linéaire
+        tags = tag_sets.get(id(el))
+        if tags is None:
+            tags = tag_sets[id(el)] = set(el.tags)
+        if tag not in tags:
+            tags.add(tag)
+            el.tags.append(tag)
 
     # Groups
-    for _, row in apps[apps["Application"] == "#"].iterrows():
-        g = model.Group(row["Name"])
-        g.tags.extend(["ApplicationGroup", f"status:{row['Status'] or 'keep'}"])
-        elem_by_id[row["ID"]] = g
-        groups_by_id[row["ID"]] = g
+    is_app = apps["Application"].to_numpy() == "#"
+    is_comp = apps["Component"].to_numpy() == "#"
+    # formaté une fois par catégorie de Status, pas par ligne
+    status_tag = apps["Status"].map(lambda s: f"status:{s or 'keep'}").to_numpy()
+    app_rows = apps.loc[is_app, ["ID", "Name"]]
+    groups = [model.Group(name) for name in app_rows["Name"].tolist()]
+    for g, stag in zip(groups, status_tag[is_app]):
+        g.tags.extend(["ApplicationGroup", stag])
+    groups_by_id: Dict[str, any] = dict(zip(app_rows["ID"].tolist(), groups))
+    elem_by_id.update(groups_by_id)
 
     # Containers
-    for _, row in apps[apps["Component"] == "#"].iterrows():
-        parent = groups_by_id.get(row["ParentAppID"])
+    cont_rows = apps.loc[is_comp, ["ID", "Name", "ParentAppID", "Description"]]
+    cont_ids, conts, parents = [], [], []
+    for (cont_id, name, parent_id, descr), stag in zip(cont_rows.itertuples(index=False, name=None),
+                                                       status_tag[is_comp]):
+        parent = groups_by_id.get(parent_id)
         if not parent:
-            logging.warning("Skip container %s: parent %s missing", row["ID"], row["ParentAppID"])
+            logging.warning("Skip container %s: parent %s missing", cont_id, parent_id)
             continue
-        cont = parent.Container(row["Name"], row.get("Description", ""), technology="")
-        cont.tags.extend(["ApplicationContainer", f"status:{row['Status'] or 'keep'}"])
-        elem_by_id[row["ID"]] = cont
-        container_parent[cont] = parent
-
-    # Relationships + tag proc:* on containers/groups
-    seen = set()
-    for _, f in flows.iterrows():
-        src, dst = elem_by_id.get(f["Outbound"]), elem_by_id.get(f["Inbound"])
-        if not src or not dst:
-            continue
-        k = (f["Outbound"], f["Inbound"], f["Objet"], f["Protocol"], f["Format"])
-        if k in seen:
-            continue
-        seen.add(k)
-        desc = f["Name"] or f["Objet"]
-        src.uses(dst, desc, f["Protocol"])
-        for proc in split_multi(f["BusinessProcess"]):
-            tag = f"proc:{proc}"
-            for el in (src, dst):
-                if tag not in el.tags:
-                    el.tags.append(tag)
-
-    # Propagate tags to groups
-    for cont, grp in container_parent.items():
-        for tag in cont.tags:
-            if tag.startswith("proc:") and tag not in grp.tags:
-                grp.tags.append(tag)
-
-    # CustomView per process
-    for _, prow in procs.iterrows():
-        pid = prow["ID"].strip()
+        cont = parent.Container(name, descr, technology="")
+        cont.tags.extend(["ApplicationContainer", stag])
+        cont_ids.append(cont_id)
+        conts.append(cont)
+        parents.append(parent)
+    elem_by_id.update(zip(cont_ids, conts))
+    container_parent.update(zip(conts, parents))
+
+    # Relationships
+    flows = flows.drop_duplicates(subset=["Outbound", "Inbound", "Objet", "Protocol", "Format"], keep="first")
+    srcs = flows["Outbound"].map(elem_by_id)
+    dsts = flows["Inbound"].map(elem_by_id)
+    known = (srcs.notna() & dsts.notna()).to_numpy()
+    flows, srcs, dsts = flows[known], srcs.to_numpy()[known], dsts.to_numpy()[known]
+    for src, dst, name, objet, proto in zip(srcs, dsts, flows["Name"].tolist(),
+                                            flows["Objet"].tolist(), flows["Protocol"].tolist()):
+        src.uses(dst, name or objet, proto)
+
+    ends = pd.DataFrame({
+        "el": np.column_stack([srcs, dsts]).ravel(),
+        "proc": flows["BusinessProcess"].map(split_multi).repeat(2).to_numpy(),
+    }).explode("proc").dropna().drop_duplicates()
+    for el, proc in ends.itertuples(index=False, name=None):
+        tag = f"proc:{proc}"
+        add_tag(el, tag)
+        grp = container_parent.get(el)
+        if grp is not None:
+            add_tag(grp, tag)
+            proc_index.setdefault(tag, {})[el] = None
+
+    # CustomView per process — containers listed in group / declaration order
+    cont_rank = {c: i for i, c in enumerate(c for g in groups for c in g.elements)}
+    for pid, pname in procs[["ID", "Name"]].itertuples(index=False, name=None):
+        pid = pid.strip()
         if not pid:
             continue
-        pname = prow["Name"].strip() or pid
+        pname = pname.strip() or pid
         tag = f"proc:{pid.lower()}"
         view = ws.CustomView(f"Proc{camel(pname)}", f"{pname} (process view)")
 
         group_map: Dict[str, list] = {}
-        for grp in groups_by_id.values():
-            conts = [c for c in grp.elements if tag in c.tags]
-            if conts:
-                group_map[grp.name] = conts
+        for c in sorted(proc_index.get(tag, ()), key=cont_rank.__getitem__):
+            group_map.setdefault(container_parent[c].name, []).append(c)
         view.group_map = group_map  # type: ignore
         logging.debug("Process %s → %d groups", pid, len(group_map))
 
@@ -209,6 +244,8 @@ def main():
     parser.add_argument("--log-level", default="INFO")
     args = parser.parse_args()
 
+    from structurizr_excel.builder import StreamDumper
+
     logging.basicConfig(level=args.log_level)
     apps, flows, procs = load_excel(Path(args.excel))
     validate(apps, flows)
@@ -216,11 +253,12 @@ def main():
 
     out = Path(args.output)
     out.mkdir(parents=True, exist_ok=True)
-    (out / "workspace.dsl").write_text(ws.dump(), encoding="utf-8")
-    logging.info("DSL saved → %s", out / "workspace.dsl")
-
-    if args.log_level.upper() == "DEBUG":
-        print(ws.dump())
+    dsl_path = out / "workspace.dsl"
+    # En DEBUG, le DSL est aussi recopié sur stdout dans la même passe
+    echo = (sys.stdout,) if args.log_level.upper() == "DEBUG" else ()
+    with dsl_path.open("w", encoding="utf-8") as fh:
+        ws.dump(StreamDumper(fh, *echo))
+    logging.info("DSL saved → %s", dsl_path)
 
 if __name__ == "__main__":
     try:
@@ -1,47 +1,70 @@
 """
 builder.py – construit le Workspace Structurizr DSL :
 Organisation ▸ Application (Group) ▸ Container.
-Une CustomView par BusinessProcess regroupe les conteneurs par application.
+Une vue conteneurs par BusinessProcess regroupe les conteneurs par application.
 """
 
 import re
-import argparse, logging, sys
-from typing import Dict, Set
-from types import SimpleNamespace
-from pystructurizr.dsl import Workspace, View, Dumper, Container, Group  # type: ignore
+import logging
+from functools import lru_cache
+from typing import Dict, FrozenSet, TextIO
+import numpy as np
+import pandas as pd
+from pystructurizr.dsl import Workspace, View, Dumper, Container  # type: ignore
 from .styles import STYLES
 
 BASE_SYS_NAME = "Process Views"
 # ---------- utilitaires --------------------------------------------
-def split_multi(txt) -> Set[str]:
-    if not isinstance(txt, str) or not txt.strip():
-        return set()
-    return {t for t in re.split(r"[;,\s]+", txt.lower()) if t}
+# ; et , deviennent des espaces : str.split() sépare ensuite en C
+_SEP_TABLE = str.maketrans(";,", "  ")
 
+@lru_cache(maxsize=4096)
+def split_multi(txt) -> FrozenSet[str]:
+    if not isinstance(txt, str):
+        return frozenset()
+    return frozenset(txt.translate(_SEP_TABLE).lower().split())
+
+def _add_tag(el, tag: str) -> None:
+    # el.tags est une liste : _tagset (posé à la création) évite le scan linéaire
+    if tag not in el._tagset:
+        el._tagset.add(tag)
+        el.tags.append(tag)
+
+_NONALNUM = re.compile(r"[^0-9a-zA-Z]")
+
+@lru_cache(maxsize=1024)
 def camel(txt: str) -> str:
-    return "".join(w.capitalize() for w in re.split(r"[^0-9a-zA-Z]", txt) if w)
-
-# ---------- patches dump -------------------------------------------
-def _view_dump(self: View, dumper: Dumper):  # type: ignore
-    elem_part = self.element.instname if self.element else ""
-    key_part  = f" {self.name}" if self.name else ""
-    dumper.add(f"{self.viewkind.value} {elem_part}{key_part} {{")
-    dumper.indent()
-    if self.description:
-        dumper.add(f'description "{self.description}"')
-    # Écrit chaque include explicitement
-    for inc in dict.fromkeys(self.includes):
-        dumper.add(f'include {inc.instname}')
-    dumper.add('autoLayout lr')
-    dumper.outdent()
-    dumper.add('}')
-View.dump = _view_dump  # type: ignore
-
-_original_container_dump = Container.dump  # type: ignore
-
-def _container_dump(self: Container, dumper: Dumper):  # type: ignore
-    parent = getattr(self, "_parent", None)
-    if isinstance(parent, Group):
+    return "".join(w.capitalize() for w in _NONALNUM.split(txt) if w)
+
+# ---------- sous-classes dump --------------------------------------
+# Sous-classes plutôt que View.dump = ... : les classes de pystructurizr
+# ne sont pas modifiées à l'import
+class ProcessView(View):
+    """Vue dont chaque include est écrit explicitement (pas d'``include *``)."""
+
+    def include_all(self, elements) -> "ProcessView":
+        self.includes.extend(elements)
+        return self
+
+    def dump(self, dumper: Dumper) -> None:
+        elem_part = self.element.instname if self.element else ""
+        key_part  = f" {self.name}" if self.name else ""
+        dumper.add(f"{self.viewkind.value} {elem_part}{key_part} {{")
+        dumper.indent()
+        if self.description:
+            dumper.add(f'description "{self.description}"')
+        # Écrit chaque include explicitement
+        for inc in dict.fromkeys(self.includes):
+            dumper.add(f'include {inc.instname}')
+        dumper.add('autoLayout lr')
+        dumper.outdent()
+        dumper.add('}')
+
+
+class GroupContainer(Container):
+    """Conteneur déclaré dans un Group."""
+
+    def dump(self, dumper: Dumper) -> None:
         # Required syntax: <alias> = element <alias> "Name" "Desc" { tags ... }
         dumper.add(f'{self.instname} = container {self.instname} "{self.name}" "{self.description}" {{')
         dumper.indent()
@@ -49,19 +72,24 @@ def _container_dump(self: Container, dumper: Dumper):  # type: ignore
             dumper.add(f'tags "{", ".join(self.tags)}"')
         dumper.outdent()
         dumper.add('}')
-    else:
-        _original_container_dump(self, dumper)
 
-Container.dump = _container_dump  # type: ignore  # type: ignore  # type: ignore  # type: ignore
 
+# ---------- dumper streaming ---------------------------------------
+class StreamDumper(Dumper):
+    """Écrit chaque ligne DSL directement dans chaque flux de *targets* au lieu de les accumuler."""
+
+    def __init__(self, *targets: TextIO):
+        super().__init__()
+        self.targets = targets
+
+    def add(self, txt: str) -> None:
+        line = f'{"  " * self.level}{txt}\n'
+        for fh in self.targets:
+            fh.write(line)
+
+    def result(self) -> str:
+        return ""
 
-# ---------- ajoute CustomView --------------------------------------
-_custom_kind = SimpleNamespace(value="custom")
-def _custom_view(self, key, desc):
-    v = View(_custom_kind, None, key, desc)
-    self.views.append(v)
-    return v
-setattr(Workspace, "CustomView", _custom_view)
 
 # ---------- build_workspace ----------------------------------------
 def build_workspace(apps, flows, procs) -> Workspace:
@@ -70,73 +98,95 @@ def build_workspace(apps, flows, procs) -> Workspace:
     elem_by_id: Dict[str, any] = {}
     groups_by_id: Dict[str, any] = {}
     container_parent: Dict[any, any] = {}
+    proc_index: Dict[str, Dict[any, None]] = {}  # proc:* → conteneurs (ordonnés, sans doublon)
 
     base_sys = model.SoftwareSystem(BASE_SYS_NAME)
             # Organisations as SoftwareSystems, Applications as Groups
     org_systems: Dict[str, any] = {}
-    for _, row in apps[apps["Application"] == "#"].iterrows():
-        org_name = row.get("Organisation", "Unknown") or "Unknown"
+
+    def _get_sys(org_name: str):
+        # SoftwareSystem() enregistre l'élément dans le modèle : créé à la première demande
         sys = org_systems.get(org_name)
-        if not sys:
-            sys = model.SoftwareSystem(org_name)
-            org_systems[org_name] = sys
-        app_grp = sys.Group(row["Name"])
-        app_grp.tags.extend(["ApplicationGroup", f"status:{row['Status'] or 'keep'}"])
-        elem_by_id[row["ID"]] = app_grp
-        groups_by_id[row["ID"]] = app_grp
-
-    # Containers
-    for _, row in apps[apps["Component"] == "#"].iterrows():
-        parent = groups_by_id.get(row["ParentAppID"])
-        if not parent:
-            logging.warning("Skip container %s: parent %s missing", row["ID"], row["ParentAppID"])
-            continue
-        cont = parent.Container(row["Name"], row.get("Description", ""), technology="")
-        cont._parent = parent  # Mark parent grouprow["Name"], row.get("Description", ""), technology="")
-        cont.tags.extend(["ApplicationContainer", f"status:{row['Status'] or 'keep'}"])
-        elem_by_id[row["ID"]] = cont
-        container_parent[cont] = parent
-
-    # Relationships + tag proc:* on containers/groups
-    seen = set()
-    for _, f in flows.iterrows():
-        src, dst = elem_by_id.get(f["Outbound"]), elem_by_id.get(f["Inbound"])
-        if not src or not dst:
+        if sys is None:
+            sys = org_systems[org_name] = model.SoftwareSystem(org_name)
+        return sys
+
+    # Status est catégoriel : le tag status:* n'est formaté qu'une fois par catégorie
+    status_tag = apps["Status"].map(lambda s: f"status:{s or 'keep'}").to_numpy()
+    # Une seule passe sur apps : groupes créés, conteneurs mis en attente
+    rows = apps[["ID", "Name", "Organisation", "Application", "Component", "ParentAppID", "Description"]]
+    app_ids, groups, pending = [], [], []
+    for (row_id, name, org, app_flag, comp_flag, parent_id, descr), stag in zip(
+            rows.itertuples(index=False, name=None), status_tag):
+        if comp_flag == "#":
+            pending.append((row_id, name, parent_id, descr, stag))
+        if app_flag != "#":
             continue
-        k = (f["Outbound"], f["Inbound"], f["Objet"], f["Protocol"], f["Format"])
-        if k in seen:
+        app_grp = _get_sys(org or "Unknown").Group(name)
+        app_grp.tags.extend(["ApplicationGroup", stag])
+        app_grp._tagset = set(app_grp.tags)
+        app_ids.append(row_id)
+        groups.append(app_grp)
+    groups_by_id.update(zip(app_ids, groups))
+    elem_by_id.update(groups_by_id)
+
+    # Containers (après la passe : groups_by_id est complet)
+    cont_ids, conts = [], []
+    for cont_id, name, parent_id, descr, stag in pending:
+        parent = groups_by_id.get(parent_id)
+        if not parent:
+            logging.warning("Skip container %s: parent %s missing", cont_id, parent_id)
             continue
-        seen.add(k)
-        desc = f["Name"] or f["Objet"]
-        src.uses(dst, desc, f["Protocol"])
-        for proc in split_multi(f["BusinessProcess"]):
-            tag = f"proc:{proc}"
-            for el in (src, dst):
-                if tag not in el.tags:
-                    el.tags.append(tag)
-
-    # Propagate tags to groups
-    for cont, grp in container_parent.items():
-        for tag in cont.tags:
-            if tag.startswith("proc:") and tag not in grp.tags:
-                grp.tags.append(tag)
-
-        # ContainerView per BusinessProcess (based on base_sys)
-    for _, bp in procs.iterrows():
-        pid = bp["ID"].strip()
+        cont = parent.Container(GroupContainer(name, descr, technology=""))
+        cont._parent = parent  # Mark parent group
+        cont.tags.extend(["ApplicationContainer", stag])
+        cont._tagset = set(cont.tags)
+        cont_ids.append(cont_id)
+        conts.append(cont)
+    elem_by_id.update(zip(cont_ids, conts))
+    container_parent.update((c, c._parent) for c in conts)
+
+    # Relationships
+    flows = flows.drop_duplicates(subset=["Outbound", "Inbound", "Objet", "Protocol", "Format"], keep="first")
+    # id → élément résolu une fois par colonne ; extrémités inconnues écartées
+    srcs = flows["Outbound"].map(elem_by_id)
+    dsts = flows["Inbound"].map(elem_by_id)
+    known = (srcs.notna() & dsts.notna()).to_numpy()
+    flows, srcs, dsts = flows[known], srcs.to_numpy()[known], dsts.to_numpy()[known]
+    for src, dst, name, objet, proto in zip(srcs, dsts, flows["Name"].tolist(),
+                                            flows["Objet"].tolist(), flows["Protocol"].tolist()):
+        src.uses(dst, name or objet, proto)
+
+    # Tag proc:* : paires (extrémité, proc) uniques calculées par pandas ;
+    # src/dst entrelacés pour conserver l'ordre des tags de chaque élément
+    ends = pd.DataFrame({
+        "el": np.column_stack([srcs, dsts]).ravel(),
+        "proc": flows["BusinessProcess"].map(split_multi).repeat(2).to_numpy(),
+    }).explode("proc").dropna().drop_duplicates()
+    for el, proc in ends.itertuples(index=False, name=None):
+        tag = f"proc:{proc}"
+        _add_tag(el, tag)
+        grp = container_parent.get(el)
+        if grp is not None:
+            # propagation au groupe parent dans la même passe
+            _add_tag(grp, tag)
+            proc_index.setdefault(tag, {})[el] = None
+
+    # ContainerView per BusinessProcess (based on base_sys)
+    # rang de déclaration : conserve l'ordre groupe ▸ conteneur des includes
+    cont_rank = {c: i for i, c in enumerate(c for g in groups_by_id.values() for c in g.elements)}
+    for pid, pname in procs[["ID", "Name"]].itertuples(index=False, name=None):
+        pid = pid.strip()
         if not pid:
             continue
-        pname = bp["Name"].strip() or pid
+        pname = pname.strip() or pid
         tag   = f"proc:{pid.lower()}"
-        view  = ws.ContainerView(base_sys, f"Proc{camel(pname)}", f"{pname} (process view)")
-
-        # Inclure uniquement les conteneurs et leurs groupes portant le tag
-        for grp in groups_by_id.values():
-            for c in grp.elements:
-                logging.debug(f"{tag}")
-                logging.debug(f"proc:{c.tags}")
-                if tag in c.tags:
-                    view.include(c)
+        view  = ProcessView(View.Kind.CONTAINER, base_sys, f"Proc{camel(pname)}", f"{pname} (process view)")
+        ws.views.append(view)
+
+        # Inclure uniquement les conteneurs portant le tag (index inversé)
+        view.include_all(sorted(proc_index.get(tag, ()), key=cont_rank.__getitem__))
+        logging.debug("Process %s → %d containers", pid, len(view.includes))
 
     ws.Styles(*STYLES)
     return ws
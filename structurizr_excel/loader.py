@@ -2,50 +2,260 @@
 loader.py – lecture et validation du fichier Excel.
 """
 
+import hashlib, logging, os
 from pathlib import Path
-from typing import Tuple, Set
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
 import pandas as pd
+try:
+    from python_calamine import CalamineWorkbook
+except ImportError:  # repli : openpyxl en lecture seule (streaming)
+    CalamineWorkbook = None
 
-REQUIRED_APP: Set[str] = {
+REQUIRED_APP: FrozenSet[str] = frozenset({
     "ID", "Name", "Application", "Component", "ParentAppID", "Status", "Organisation"
-}
-REQUIRED_FLOW: Set[str] = {
+})
+REQUIRED_FLOW: FrozenSet[str] = frozenset({
     "ID", "Name", "Outbound", "Inbound", "Objet",
     "Protocol", "Format", "Tags", "BusinessProcess"
+})
+
+CACHE_DIR = Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache")) / "sheet2diagram"
+_CACHED_SHEETS = ("apps", "flows", "procs")
+# À incrémenter dès que la sortie de _parse_excel change : invalide les caches existants
+_CACHE_VERSION = 1
+# Colonnes lues par feuille : les autres colonnes de l'export sont ignorées
+_USED_COLUMNS: Dict[str, FrozenSet[str]] = {
+    "Applications": REQUIRED_APP | {"Description"},
+    "Flows": REQUIRED_FLOW,
+    "BusinessProcesses": frozenset({"ID", "Name"}),
 }
 
-def _read(sheet: str, path: Path) -> pd.DataFrame:
-    df = pd.read_excel(path, sheet_name=sheet, dtype=str, engine="openpyxl").fillna("")
-    # Nettoie uniquement les colonnes de type objet (str)
-    for col in df.select_dtypes(include="object"):
-        df[col] = df[col].str.strip()
-    return df
+def _cell(value) -> str:
+    if value is None:
+        return ""
+    # calamine renvoie les nombres en float : 1.0 → "1" comme avec dtype=str
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value).strip()
+
+
+def _labels(header) -> List[str]:
+    # En-têtes répétés renommés comme pd.read_excel (Name, Name.1…) :
+    # seule la première occurrence garde le nom attendu
+    seen: Dict[str, int] = {}
+    labels = []
+    for h in map(_cell, header):
+        n = seen.get(h, 0)
+        seen[h] = n + 1
+        labels.append(f"{h}.{n}" if n else h)
+    return labels
+
+
+def _frame(header, rows, lower: Iterable[str] = (),
+           keep: Optional[Iterable[str]] = None) -> pd.DataFrame:
+    # Les cellules sont nettoyées (strip) à la construction des lignes ;
+    # seules les colonnes *keep* sont lues et les colonnes *lower*
+    # (ex. Status) sont normalisées dans la même passe
+    columns = _labels(header)
+    idx = [i for i, h in enumerate(columns) if keep is None or h in keep]
+    low = {i for i in idx if columns[i] in lower}
+    if not low:
+        data = [[_cell(r[i]) for i in idx] for r in rows]
+    else:
+        data = [[_cell(r[i]).lower() if i in low else _cell(r[i]) for i in idx] for r in rows]
+    return pd.DataFrame(data, columns=[columns[i] for i in idx])
+
+
+def _read(wb: CalamineWorkbook, sheet: str, lower: Iterable[str] = (),
+          keep: Optional[Iterable[str]] = None) -> pd.DataFrame:
+    rows = wb.get_sheet_by_name(sheet).to_python(skip_empty_area=True)
+    if not rows:
+        return pd.DataFrame()
+    return _frame(rows[0], rows[1:], lower, keep)
+
 
+def _read_openpyxl(ws, lower: Iterable[str] = (), keep: Optional[Iterable[str]] = None) -> pd.DataFrame:
+    # Même zone que calamine (skip_empty_area) : lignes/colonnes vides en bordure
+    # ignorées (y compris cellules seulement formatées), lignes vides intérieures conservées
+    rows = list(ws.iter_rows(values_only=True))
+    filled = [i for i, r in enumerate(rows) if any(v is not None for v in r)]
+    if not filled:
+        return pd.DataFrame()
+    rows = rows[filled[0]:filled[-1] + 1]
+    used = [[j for j, v in enumerate(r) if v is not None] for r in rows]
+    first = min(u[0] for u in used if u)
+    last  = max(u[-1] for u in used if u) + 1
+    pad = (None,) * (last - first)
+    rows = [(r[first:last] + pad)[:last - first] for r in rows]
+    return _frame(rows[0], rows[1:], lower, keep)
 
-def load_excel(path: Path) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
-    apps  = _read("Applications", path)
-    flows = _read("Flows",        path)
+
+def _read_sheets_openpyxl(path: Path, required: Iterable[str], optional: Iterable[str],
+                          lower: Dict[str, Iterable[str]],
+                          columns: Dict[str, Iterable[str]]) -> Dict[str, pd.DataFrame]:
+    from openpyxl import load_workbook
+
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        present = set(wb.sheetnames)
+        if m := [n for n in required if n not in present]:
+            raise ValueError(f"Missing sheets: {', '.join(m)}")
+        return {n: _read_openpyxl(wb[n], lower.get(n, ()), columns.get(n))
+                for n in (*required, *optional) if n in present}
+    finally:
+        wb.close()
+
+
+def _read_sheets_polars(path: Path, required: Iterable[str], optional: Iterable[str],
+                        lower: Dict[str, Iterable[str]],
+                        columns: Dict[str, Iterable[str]]) -> Optional[Dict[str, pd.DataFrame]]:
+    """Lecture via fastexcel/polars ; None si le moteur est indisponible ou échoue."""
     try:
-        procs = _read("BusinessProcesses", path)
-    except ValueError:
-        procs = pd.DataFrame(columns=["ID", "Name"])
+        import fastexcel
+        import polars as pl
+    except ImportError as exc:
+        logging.warning("polars engine unavailable (%s), using default reader", exc)
+        return None
+
+    try:
+        reader = fastexcel.read_excel(str(path))
+        present = set(reader.sheet_names)
+        if m := [n for n in required if n not in present]:
+            raise ValueError(f"Missing sheets: {', '.join(m)}")
+        out = {}
+        for n in (*required, *optional):
+            if n not in present:
+                continue
+            keep, low = columns.get(n), lower.get(n, ())
+            # En-tête lu comme une ligne de données : fastexcel renomme les doublons
+            # Name_1, indiscernables d'une vraie colonne Name_1 ; dtypes="string"
+            # convertit 1.0 → "1" comme _cell et laisse le texte "1.0" intact
+            raw = reader.load_sheet_by_name(n, header_row=None, dtypes="string").to_polars()
+            if raw.is_empty():
+                out[n] = pd.DataFrame()
+                continue
+            labels = _labels(raw.row(0))
+            idx = [i for i, h in enumerate(labels) if keep is None or h in keep]
+            df = raw.slice(1).select(raw.columns[i] for i in idx)
+            df.columns = [labels[i] for i in idx]
+            df = df.with_columns(pl.all().str.strip_chars().fill_null(""))
+            df = df.with_columns([pl.col(c).str.to_lowercase() for c in df.columns if c in low])
+            out[n] = df.to_pandas()
+        return out
+    except (fastexcel.FastExcelError, pl.exceptions.PolarsError) as exc:
+        logging.warning("polars engine failed (%s), using default reader", exc)
+        return None
+
+
+def _reader(engine: str) -> str:
+    # Lecteur réellement utilisé : "auto" et "calamine" partagent la même clé de cache
+    if engine in ("auto", "calamine"):
+        return "openpyxl" if CalamineWorkbook is None else "calamine"
+    return engine
+
+
+def read_sheets(path: Path, required: Iterable[str], optional: Iterable[str] = (),
+                lower: Optional[Dict[str, Iterable[str]]] = None,
+                columns: Optional[Dict[str, Iterable[str]]] = None,
+                engine: str = "auto") -> Dict[str, pd.DataFrame]:
+    """Lit plusieurs feuilles en une seule ouverture du classeur.
+
+    Les feuilles *optional* absentes sont omises du résultat ;
+    *lower* donne, par feuille, les colonnes à passer en minuscules et
+    *columns* les seules colonnes à conserver (toutes si la feuille est absente).
+    *engine* : "auto" (calamine, sinon openpyxl), "calamine", "openpyxl" ou "polars".
+    """
+    lower, columns = lower or {}, columns or {}
+    if engine == "polars":
+        sheets = _read_sheets_polars(path, required, optional, lower, columns)
+        if sheets is not None:
+            return sheets
+    if _reader(engine) == "openpyxl":
+        return _read_sheets_openpyxl(path, required, optional, lower, columns)
+    with CalamineWorkbook.from_path(str(path)) as wb:
+        present = set(wb.sheet_names)
+        if m := [n for n in required if n not in present]:
+            raise ValueError(f"Missing sheets: {', '.join(m)}")
+        return {n: _read(wb, n, lower.get(n, ()), columns.get(n))
+                for n in (*required, *optional) if n in present}
+
+
+def _parse_excel(path: Path, engine: str = "auto") -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    sheets = read_sheets(path, ("Applications", "Flows"), ("BusinessProcesses",),
+                         lower={"Applications": ("Status",)}, columns=_USED_COLUMNS, engine=engine)
+    apps, flows = sheets["Applications"], sheets["Flows"]
+    # Feuille absente ou vide (sans en-tête) : procs garde ses colonnes ID/Name
+    procs = sheets.get("BusinessProcesses", pd.DataFrame()).reindex(columns=["ID", "Name"], fill_value="")
     
-    apps["Status"] = apps["Status"].str.lower()
+    # Quelques valeurs seulement (add/change/remove/keep) : codes int8 au lieu de chaînes
+    if "Status" in apps.columns:
+        apps["Status"] = apps["Status"].astype("category")
+    if "Description" not in apps.columns:
+        apps["Description"] = ""
     
     return apps, flows, procs
 
+
+def _path_key(path: Path) -> str:
+    return hashlib.blake2s(str(path.resolve()).encode(), digest_size=8).hexdigest()
+
+
+def _cache_files(path: Path, engine: str = "auto") -> Tuple[Path, ...]:
+    # Nom = <chemin>-<moteur>-<état> : l'état (version du parseur, mtime, taille)
+    # invalide le cache, le préfixe <chemin>-<moteur> permet de purger les entrées périmées
+    st    = path.stat()
+    state = hashlib.blake2s(f"{_CACHE_VERSION}:{st.st_mtime_ns}:{st.st_size}".encode(),
+                            digest_size=8).hexdigest()
+    return tuple(CACHE_DIR / f"{_path_key(path)}-{_reader(engine)}-{state}.{name}.feather"
+                 for name in _CACHED_SHEETS)
+
+
+def _purge_stale(path: Path, keep: Tuple[Path, ...], engine: str = "auto") -> None:
+    # Entrées du même moteur seulement : alterner les moteurs n'évince pas l'autre cache
+    for f in CACHE_DIR.glob(f"{_path_key(path)}-{_reader(engine)}-*.feather"):
+        if f not in keep:
+            f.unlink(missing_ok=True)
+
+
+def load_excel(path: Path, use_cache: bool = True,
+               engine: str = "auto") -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """Charge les feuilles, via le cache Feather si le xlsx n'a pas changé."""
+    if not use_cache:
+        return _parse_excel(path, engine)
+
+    files = _cache_files(path, engine)
+    if all(f.exists() for f in files):
+        try:
+            apps, flows, procs = (pd.read_feather(f) for f in files)
+            logging.debug("Loaded %s from cache %s", path, CACHE_DIR)
+            return apps, flows, procs
+        except (ImportError, OSError, ValueError) as exc:
+            logging.debug("Cache read failed: %s", exc)
+
+    apps, flows, procs = _parse_excel(path, engine)
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        for df, f in zip((apps, flows, procs), files):
+            df.to_feather(f)
+        _purge_stale(path, files, engine)
+    except (ImportError, OSError) as exc:
+        logging.debug("Cache write skipped: %s", exc)
+    return apps, flows, procs
+
 def validate(apps: pd.DataFrame, flows: pd.DataFrame) -> None:
-    if m := REQUIRED_APP - set(apps.columns):
+    if m := REQUIRED_APP.difference(apps.columns):
         raise ValueError(f"Applications missing columns: {', '.join(m)}")
-    if m := REQUIRED_FLOW - set(flows.columns):
+    if m := REQUIRED_FLOW.difference(flows.columns):
         raise ValueError(f"Flows missing columns: {', '.join(m)}")
 
-    ids = set(apps["ID"])
-    bad_parent = apps[(apps["Component"] == "#") & (~apps["ParentAppID"].isin(ids))]
-    if not bad_parent.empty:
-        raise ValueError("Invalid ParentAppID rows: " + ", ".join(map(str, bad_parent.index)))
+    # isin sur le tableau numpy brut : table de hachage C, pas de sous-DataFrame
+    ids = apps["ID"].to_numpy()
+    is_comp = apps["Component"].to_numpy() == "#"
+    bad_mask = is_comp & ~apps["ParentAppID"].isin(ids).to_numpy()
+    if bad_mask.any():
+        raise ValueError("Invalid ParentAppID rows: " + ", ".join(map(str, apps.index[bad_mask])))
 
     for col in ("Outbound", "Inbound"):
-        bad = flows[~flows[col].isin(ids)]
-        if not bad.empty:
-            raise ValueError(f"{col} unknown IDs rows: {', '.join(map(str, bad.index))}")
+        known = flows[col].isin(ids).to_numpy()
+        if not known.all():
+            raise ValueError(f"{col} unknown IDs rows: {', '.join(map(str, flows.index[~known]))}")
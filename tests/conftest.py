@@ -0,0 +1,33 @@
+import pytest
+from openpyxl import Workbook
+
+APPS = [
+    ["ID", "Name", "Application", "Component", "ParentAppID", "Status", "Organisation"],
+    ["A1", "App One", "#", "", "", "Add", "Org"],
+    ["C1", "Comp One", "", "#", "A1", "keep", "Org"],
+    ["C2", "Comp Two", "", "#", "A1", None, "Org"],
+]
+FLOWS = [
+    ["ID", "Name", "Outbound", "Inbound", "Objet", "Protocol", "Format", "Tags", "BusinessProcess"],
+    ["F1", "flow", "C1", "C2", "obj", "HTTP", "JSON", "", "p1"],
+]
+PROCS = [["ID", "Name"], ["p1", "Process One"]]
+
+
+@pytest.fixture
+def make_workbook(tmp_path):
+    """Écrit un classeur minimal ; *overrides* remplace ou ajoute des feuilles (None = supprimée)."""
+    def _make(name="inventory.xlsx", **overrides):
+        sheets = {"Applications": APPS, "Flows": FLOWS, "BusinessProcesses": PROCS, **overrides}
+        wb = Workbook()
+        wb.remove(wb.active)
+        for sheet, rows in sheets.items():
+            if rows is None:
+                continue
+            ws = wb.create_sheet(sheet)
+            for row in rows:
+                ws.append(row)
+        path = tmp_path / name
+        wb.save(path)
+        return path
+    return _make
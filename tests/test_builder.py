@@ -0,0 +1,55 @@
+import io
+
+import pytest
+from pystructurizr.dsl import Identifier
+
+from structurizr_excel.builder import StreamDumper, build_workspace
+from structurizr_excel.loader import load_excel
+
+
+@pytest.fixture(autouse=True)
+def fresh_identifiers(monkeypatch):
+    # pystructurizr suffixe les noms déjà vus dans le processus (comp_one_2…)
+    monkeypatch.setattr(Identifier, "counter", {})
+
+
+def _dsl(path) -> list:
+    buf = io.StringIO()
+    build_workspace(*load_excel(path, use_cache=False)).dump(StreamDumper(buf))
+    return [line.strip() for line in buf.getvalue().splitlines()]
+
+
+def _block(lines, head) -> list:
+    start = lines.index(head)
+    return lines[start:lines.index("}", start) + 1]
+
+
+def test_dsl_group_containers_and_relationship(make_workbook):
+    lines = _dsl(make_workbook())
+    assert _block(lines, 'group "App One" {') == [
+        'group "App One" {',
+        'comp_one = container comp_one "Comp One" "" {',
+        'tags "ApplicationContainer, status:keep, proc:p1"',
+        "}",
+    ]
+    assert 'comp_two = container comp_two "Comp Two" "" {' in lines
+    assert 'comp_one -> comp_two "flow" "HTTP"' in lines
+
+
+def test_dsl_process_view_includes(make_workbook):
+    lines = _dsl(make_workbook())
+    assert _block(lines, "container process_views ProcProcessOne {") == [
+        "container process_views ProcProcessOne {",
+        'description "Process One (process view)"',
+        "include comp_one",
+        "include comp_two",
+        "autoLayout lr",
+        "}",
+    ]
+
+
+def test_dsl_streams_to_every_target(make_workbook):
+    ws = build_workspace(*load_excel(make_workbook(), use_cache=False))
+    a, b = io.StringIO(), io.StringIO()
+    ws.dump(StreamDumper(a, b))
+    assert a.getvalue() == b.getvalue() == ws.dump() + "\n"
@@ -0,0 +1,167 @@
+import importlib
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+from structurizr_excel import loader
+from structurizr_excel.builder import build_workspace
+from structurizr_excel.loader import load_excel, validate
+
+
+@pytest.mark.parametrize("procs", [[], None], ids=["empty-sheet", "missing-sheet"])
+def test_business_processes_without_header(make_workbook, procs):
+    apps, flows, procs_df = load_excel(make_workbook(BusinessProcesses=procs), use_cache=False)
+    assert list(procs_df.columns) == ["ID", "Name"]
+    assert procs_df.empty
+    validate(apps, flows)
+    ws = build_workspace(apps, flows, procs_df)
+    assert ws.views == []
+
+
+@pytest.fixture
+def v10(monkeypatch):
+    # L'import patche View.dump et ajoute Workspace.CustomView : annulé après le test
+    from pystructurizr import dsl
+
+    monkeypatch.setattr(dsl.View, "dump", dsl.View.dump)
+    monkeypatch.setattr(dsl.Workspace, "CustomView", None, raising=False)
+    monkeypatch.delitem(sys.modules, "generate_pystructurizr", raising=False)
+    yield importlib.import_module("generate_pystructurizr")
+    sys.modules.pop("generate_pystructurizr", None)
+
+
+def test_v10_business_processes_without_header(make_workbook, v10):
+    apps, flows, procs = v10.load_excel(make_workbook(BusinessProcesses=[]))
+    assert list(procs.columns) == ["ID", "Name"]
+    v10.build_workspace(apps, flows, procs)
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    d = tmp_path / "cache"
+    monkeypatch.setattr(loader, "CACHE_DIR", d)
+    return d
+
+
+def test_cache_hit_returns_parsed_frames(make_workbook, cache_dir):
+    path = make_workbook()
+    first = load_excel(path)
+    assert len(list(cache_dir.glob("*.feather"))) == 3
+    for cached, parsed in zip(load_excel(path), first):
+        pd.testing.assert_frame_equal(cached, parsed)
+
+
+def test_cache_version_bump_reparses(make_workbook, cache_dir, monkeypatch):
+    path = make_workbook()
+    old = loader._cache_files(path)
+    load_excel(path)
+    monkeypatch.setattr(loader, "_CACHE_VERSION", loader._CACHE_VERSION + 1)
+    assert loader._cache_files(path) != old
+    load_excel(path)
+    assert not any(f.exists() for f in old)
+    assert len(list(cache_dir.glob("*.feather"))) == 3
+
+
+def test_cache_purges_entries_of_previous_saves(make_workbook, cache_dir):
+    path = make_workbook()
+    other = make_workbook("other.xlsx")
+    load_excel(path)
+    load_excel(other)
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    load_excel(path)
+    # 3 fichiers pour le classeur modifié, 3 pour l'autre classeur (intacts)
+    assert len(list(cache_dir.glob("*.feather"))) == 6
+    assert all(f.exists() for f in loader._cache_files(other))
+
+
+def test_openpyxl_fallback_matches_calamine(make_workbook, monkeypatch):
+    # zone utile décalée (B3), ligne vide intérieure, cellule formatée vide en fin de feuille
+    from openpyxl import load_workbook
+    from openpyxl.styles import Font
+
+    path = make_workbook()
+    wb = load_workbook(path)
+    ws = wb["Flows"]
+    ws.insert_rows(1, 2)
+    ws.insert_cols(1)
+    ws.insert_rows(4)
+    ws["M20"].font = Font(bold=True)
+    wb.save(path)
+
+    sheets = ("Applications", "Flows", "BusinessProcesses")
+    expected = loader.read_sheets(path, sheets)
+    monkeypatch.setattr(loader, "CalamineWorkbook", None)
+    got = loader.read_sheets(path, sheets)
+    assert len(expected["Flows"]) == 2
+    for name in sheets:
+        pd.testing.assert_frame_equal(got[name], expected[name])
+
+
+def test_polars_engine_matches_calamine(make_workbook):
+    pytest.importorskip("polars")
+    pytest.importorskip("fastexcel")
+    from openpyxl import load_workbook
+
+    path = make_workbook(BusinessProcesses=[])
+    wb = load_workbook(path)
+    ws = wb["Applications"]
+    ws.append(["A2", " App Two ", "#", "", "", "CHANGE", 1.0])  # nombre entier → "1"
+    ws.append([None] * 7)                                          # ligne vide intérieure
+    ws.append(["A3", "1.0", "#", "", "", "remove", 2.5])           # texte "1.0" conservé
+    wb.save(path)
+
+    expected = loader._parse_excel(path)
+    got = loader._parse_excel(path, engine="polars")
+    for g, e in zip(got, expected):
+        pd.testing.assert_frame_equal(g, e)
+
+
+def test_polars_engine_falls_back_on_reader_error(make_workbook, monkeypatch, caplog):
+    fastexcel = pytest.importorskip("fastexcel")
+    pytest.importorskip("polars")
+
+    def boom(*args, **kwargs):
+        raise fastexcel.FastExcelError("boom")
+    monkeypatch.setattr(fastexcel, "read_excel", boom)
+    path = make_workbook()
+    got = loader._parse_excel(path, engine="polars")
+    for g, e in zip(got, loader._parse_excel(path)):
+        pd.testing.assert_frame_equal(g, e)
+    assert "polars engine failed" in caplog.text
+
+
+def test_cache_is_keyed_by_engine(make_workbook, cache_dir):
+    path = make_workbook()
+    load_excel(path)
+    assert loader._cache_files(path, "openpyxl") != loader._cache_files(path)
+    assert loader._cache_files(path, "calamine") == loader._cache_files(path)
+    load_excel(path, engine="openpyxl")
+    load_excel(path, engine="calamine")
+    # chaque moteur garde son entrée : pas d'éviction mutuelle
+    assert all(f.exists() for f in loader._cache_files(path, "openpyxl"))
+    assert all(f.exists() for f in loader._cache_files(path))
+    assert len(list(cache_dir.glob("*.feather"))) == 6
+
+
+@pytest.mark.parametrize("engine", ["calamine", "openpyxl", "polars"])
+def test_repeated_header_keeps_first_column(make_workbook, engine):
+    if engine == "polars":
+        pytest.importorskip("polars")
+        pytest.importorskip("fastexcel")
+    from conftest import APPS, FLOWS
+
+    path = make_workbook(
+        Applications=[APPS[0] + ["Name"]] + [r + ["dup"] for r in APPS[1:]],
+        Flows=[FLOWS[0] + ["Name"]] + [r + ["dup"] for r in FLOWS[1:]],
+        BusinessProcesses=[["ID", "Name", "Name"], ["p1", "Process One", "dup"]],
+    )
+    apps, flows, procs = loader._parse_excel(path, engine)
+    assert apps["Name"].tolist() == ["App One", "Comp One", "Comp Two"]
+    assert flows["Name"].tolist() == ["flow"]
+    assert procs.columns.tolist() == ["ID", "Name"]
+    assert procs["Name"].tolist() == ["Process One"]
+    validate(apps, flows)
+    build_workspace(apps, flows, procs)